@@ -8,6 +8,8 @@ Changes requested:
 - Store data as normal JSON (one file per company per segment), not JSONL.
 - Still preemptible: state is embedded in the same JSON file per instrument. If stopped, it resumes.
 - Also tops up each file to include today's data if missing.
+- Avoid rewriting the whole JSON after every chunk: chunks are appended to a small NDJSON journal
+  next to the JSON and folded back into it every SAVE_EVERY_N_CHUNKS chunks and when an instrument is done.
 
 Output
 - data_upstox_json/{segment}/{TRADING_SYMBOL}.json
@@ -30,6 +32,10 @@ Output
     "last_updated_utc": "....Z",
     "schema_version": 2
   }
+- data_upstox_json/{segment}/{TRADING_SYMBOL}.ndjson (transient journal)
+  One line per fetched chunk that is not yet in the JSON:
+  {"tf": "days|1", "mode": "backward", "candles": [...], "next_backfill_to_date": ..., "done_backfill": ...}
+  Replayed on load and removed once the JSON has been rewritten.
 
 Notes
 - JSON files can grow large. This meets your "normal JSON" and "1 file per company per segment" requirements.
@@ -38,20 +44,32 @@ Notes
 
 import asyncio
 import aiohttp
-import gzip
-import json
+import bisect
+import functools
+import ijson
+import orjson
 import os
 import random
-import string
+import signal
+import tempfile
 from pathlib import Path
-from datetime import date, timedelta, datetime
+from datetime import date, timedelta, datetime, timezone
+from email.utils import parsedate_to_datetime
 from dateutil.relativedelta import relativedelta
 import sys
 import logging
+import math
+from operator import itemgetter
 import time
 import typing
 from urllib.parse import quote
 
+try:
+    # Optional: ISA-L's SIMD inflate is a drop-in for zlib and several times faster
+    from isal import isal_zlib as zlib
+except ImportError:
+    import zlib
+
 # ----------------------------
 # CONFIGURATION
 # ----------------------------
@@ -61,7 +79,14 @@ OUTPUT_DIR = Path("data_upstox_json")
 MAX_CONCURRENCY = 6
 REQUESTS_PER_SECOND = 4
 RETRY_COUNT = 3
-RETRY_BACKOFF = 2.0
+RETRY_BASE_DELAY = 1.0
+RETRY_MAX_DELAY = 60.0
+RETRY_AFTER_MAX_SECONDS = 600.0
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_COOLDOWN_SECONDS = 30.0
+KEEPALIVE_TIMEOUT = 75.0
+DNS_CACHE_TTL = 600
+SAVE_EVERY_N_CHUNKS = 50
 USER_AGENT = "upstox-bulk-harvester/1.3-json"
 
 TIMEFRAMES = [
@@ -143,43 +168,115 @@ def get_chunk_delta(unit: str, interval: str) -> relativedelta:
 def fmt_date(d: date) -> str:
     return d.isoformat()
 
-def parse_date_from_timestamp(ts: str) -> date:
-    # "YYYY-MM-DD..." -> first 10 chars
-    return date.fromisoformat(ts[:10])
-
 def iso_utc_now() -> str:
     return datetime.utcnow().isoformat() + "Z"
 
-def rand_suffix(n: int = 6) -> str:
-    return "".join(random.choices(string.ascii_lowercase + string.digits, k=n))
+# mkstemp creates files 0600; read the umask once so outputs keep normal permissions
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+JSON_ROWS_PER_PIECE = 20000
+
+def iter_json_bytes(obj, rows_per_piece: int = JSON_ROWS_PER_PIECE) -> typing.Iterator[bytes]:
+    """
+    Serialize obj piecewise; the concatenation equals orjson.dumps(obj) minus
+    in-memory keys starting with "_" (e.g. "_ts_index"), at any depth.
+    Dicts are walked key by key and long lists (candles) are emitted in slices,
+    so a multi-megabyte document never exists as a single bytes object.
+    """
+    if isinstance(obj, dict):
+        yield b"{"
+        first = True
+        for k, v in obj.items():
+            if isinstance(k, str) and k.startswith("_"):
+                continue
+            yield (b"%s:" if first else b",%s:") % orjson.dumps(k)
+            first = False
+            yield from iter_json_bytes(v, rows_per_piece)
+        yield b"}"
+    elif isinstance(obj, list) and len(obj) > rows_per_piece:
+        yield b"["
+        for start in range(0, len(obj), rows_per_piece):
+            if start:
+                yield b","
+            yield orjson.dumps(obj[start:start + rows_per_piece])[1:-1]
+        yield b"]"
+    else:
+        yield orjson.dumps(obj)
+
+def iter_doc_bytes(doc: dict) -> typing.Iterator[bytes]:
+    """
+    iter_json_bytes() for an instrument document. The "instrument" block never
+    changes after init_doc, so it is encoded once and cached on the doc as
+    "_header_bytes"; each save only serializes timeframes and the trailer.
+    """
+    if "instrument" not in doc:
+        yield from iter_json_bytes(doc)
+        return
+    header = doc.get("_header_bytes")
+    if header is None:
+        header = b'{"instrument":' + orjson.dumps(doc["instrument"])
+        doc["_header_bytes"] = header
+    yield header
+    for k, v in doc.items():
+        if k == "instrument" or k.startswith("_"):
+            continue
+        yield b",%s:" % orjson.dumps(k)
+        yield from iter_json_bytes(v)
+    yield b"}"
+
+def _fsync_fd(fd: int) -> None:
+    # fdatasync skips the inode metadata flush where the platform has it
+    sync = getattr(os, "fdatasync", os.fsync)
+    try:
+        sync(fd)
+    except Exception:
+        pass
+
+def _fsync_dir(directory: Path) -> None:
+    # Persist the rename itself; directories can't be opened this way on Windows
+    if sys.platform == "win32":
+        return
+    try:
+        dfd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(dfd)
+    except OSError:
+        pass
+    finally:
+        os.close(dfd)
 
 def atomic_write_json(path: Path, obj: dict, max_retries: int = 10) -> None:
     """
     Robust atomic write with retries for Windows.
-    - Write to a temp file in the same directory.
-    - Flush+fsync.
+    - Stream the serialized pieces into a temp file in the same directory.
+    - Flush+fsync, then fsync the directory after the rename. Saves only happen
+      every SAVE_EVERY_N_CHUNKS chunks (the journal covers the rest), so this is cheap.
     - os.replace() onto the destination with exponential backoff if locked.
     - As last resort, write directly (non-atomic).
     """
     directory = path.parent
     directory.mkdir(parents=True, exist_ok=True)
-    tmp = directory / (path.name + f".{int(time.time()*1000)}.{rand_suffix()}.tmp")
+    fd, tmp_name = tempfile.mkstemp(dir=directory, prefix=path.name + ".", suffix=".tmp")
+    tmp = Path(tmp_name)
+    try:
+        os.chmod(tmp, 0o666 & ~_UMASK)
+    except Exception:
+        pass
 
-    data = json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
-    with open(tmp, "w", encoding="utf-8") as f:
-        f.write(data)
+    with os.fdopen(fd, "wb") as f:
+        for piece in iter_doc_bytes(obj):
+            f.write(piece)
         f.flush()
-        try:
-            os.fsync(f.fileno())
-        except Exception:
-            pass
+        _fsync_fd(f.fileno())
 
     delay = 0.05
     last_err = None
     for attempt in range(max_retries):
         try:
             os.replace(tmp, path)
-            return
         except PermissionError as e:
             last_err = e
             time.sleep(delay)
@@ -188,11 +285,17 @@ def atomic_write_json(path: Path, obj: dict, max_retries: int = 10) -> None:
             last_err = e
             time.sleep(delay)
             delay = min(delay * 2, 1.0)
+        else:
+            # Only os.replace is retried; a failing directory sync must not re-run it
+            _fsync_dir(directory)
+            return
     # Fallback: try direct write (non-atomic)
     try:
-        with open(path, "w", encoding="utf-8") as f:
-            f.write(data)
+        with open(path, "wb") as f:
+            for piece in iter_doc_bytes(obj):
+                f.write(piece)
             f.flush()
+            _fsync_fd(f.fileno())
         try:
             tmp.unlink(missing_ok=True)
         except Exception:
@@ -203,15 +306,145 @@ def atomic_write_json(path: Path, obj: dict, max_retries: int = 10) -> None:
         logging.error("Failed to write %s (even fallback). Temp at %s. Error: %s", path, tmp, e)
         raise
 
+def journal_path(path: Path) -> Path:
+    return path.with_suffix(".ndjson")
+
+def append_journal(path: Path, doc: dict, key: str, mode: str, candles: list, max_retries: int = 3) -> bool:
+    """
+    Record one fetched chunk (plus the resume state it produced) in the journal.
+    O(chunk) instead of rewriting the whole JSON; save_doc() folds it back in.
+    Retries briefly on Windows AV/scanner locks (blocking, so call it off the event
+    loop); returns False if the record could not be written, in which case the
+    caller should compact instead.
+    """
+    tf = doc["timeframes"][key]
+    record = {
+        "tf": key,
+        "mode": mode,
+        "candles": candles,
+        "next_backfill_to_date": tf.get("next_backfill_to_date"),
+        "done_backfill": tf.get("done_backfill", False),
+    }
+    data = orjson.dumps(record) + b"\n"
+    delay = 0.05
+    last_err = None
+    for attempt in range(max_retries):
+        try:
+            with open(journal_path(path), "ab") as f:
+                f.write(data)
+            return True
+        except OSError as e:
+            last_err = e
+            time.sleep(delay)
+            delay = min(delay * 2, 1.0)
+    logging.warning("Failed to append journal for %s; will rewrite the JSON instead. Last error: %s", path, last_err)
+    return False
+
+def replay_journal(path: Path, doc: dict) -> int:
+    """
+    Apply journal records left behind by an interrupted run. Merging is
+    deduplicated by timestamp, so replaying records already in the JSON is harmless.
+    """
+    jp = journal_path(path)
+    if not jp.exists():
+        return 0
+    applied = 0
+    good_offset = 0
+    torn = False
+    with open(jp, "rb") as f:
+        for line in f:
+            try:
+                if not line.endswith(b"\n"):
+                    raise ValueError("unterminated journal line")
+                record = orjson.loads(line)
+            except ValueError:
+                # Torn tail from a crash mid-append; everything before it is usable.
+                logging.warning("Ignoring truncated journal entry in %s", jp)
+                torn = True
+                break
+            good_offset += len(line)
+            try:
+                unit, interval = record["tf"].split("|", 1)
+            except Exception:
+                continue
+            tf = ensure_tf(doc, unit, interval)
+            tf["candles"] = dedup_and_merge(tf["candles"], record.get("candles") or [], mode=record.get("mode", "forward"),
+                                           ts_index=tf["_ts_index"])
+            update_tf_bounds(tf)
+            tf["next_backfill_to_date"] = record.get("next_backfill_to_date")
+            tf["done_backfill"] = bool(record.get("done_backfill"))
+            applied += 1
+    if torn:
+        # Cut the torn bytes off, otherwise the next append lands on the same
+        # line and every record written after the crash is unreadable.
+        try:
+            os.truncate(jp, good_offset)
+        except Exception as e:
+            logging.warning("Failed to truncate journal %s: %s", jp, e)
+    return applied
+
 def load_doc(path: Path) -> typing.Optional[dict]:
     if not path.exists():
         return None
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
+        doc = orjson.loads(path.read_bytes())
     except Exception as e:
         logging.warning("Failed to read JSON %s: %s", path, e)
         return None
+    applied = replay_journal(path, doc)
+    if applied:
+        logging.info("Replayed %d journal entries into %s", applied, path)
+        doc["_journaled"] = applied
+    return doc
+
+def doc_lock(doc: dict) -> asyncio.Lock:
+    """
+    Per-document lock. Saves serialize `doc` on a worker thread while timeframe
+    tasks keep fetching, so anything that mutates or writes the doc holds this.
+    """
+    lock = doc.get("_lock")
+    if lock is None:
+        lock = doc["_lock"] = asyncio.Lock()
+    return lock
+
+async def _in_thread_locked(func, *args):
+    # If the awaiting task is cancelled, still wait for the write to finish so
+    # doc_lock isn't released while a worker thread is mid-write.
+    fut = asyncio.ensure_future(asyncio.to_thread(func, *args))
+    try:
+        return await asyncio.shield(fut)
+    except asyncio.CancelledError:
+        await fut
+        raise
+
+async def record_chunk(path: Path, doc: dict, key: str, mode: str, candles: list) -> None:
+    """
+    Journal a chunk (or a bare state change when candles is empty). The JSON is
+    only rewritten every SAVE_EVERY_N_CHUNKS entries, which bounds journal size
+    and replay time; flush_doc() writes whatever is left when the caller is done.
+    Caller must hold doc_lock(doc); that keeps records in order even though the
+    append (and its retry backoff) runs in a worker thread.
+    """
+    journaled = await _in_thread_locked(append_journal, path, doc, key, mode, candles)
+    doc["_journaled"] = doc.get("_journaled", 0) + 1
+    if not journaled or doc["_journaled"] >= SAVE_EVERY_N_CHUNKS:
+        await _in_thread_locked(save_doc, path, doc)
+
+async def flush_doc(path: Path, doc: dict) -> None:
+    async with doc_lock(doc):
+        if doc.get("_journaled"):
+            await _in_thread_locked(save_doc, path, doc)
+
+def save_doc(path: Path, doc: dict) -> None:
+    """Rewrite the full JSON, then drop the journal it now supersedes."""
+    doc["last_updated_utc"] = iso_utc_now()
+    # atomic_write_json fsyncs: once the journal is gone, the JSON is the only copy
+    atomic_write_json(path, doc)
+    doc["_journaled"] = 0
+    try:
+        journal_path(path).unlink(missing_ok=True)
+    except Exception as e:
+        logging.warning("Failed to remove journal for %s: %s", path, e)
 
 def init_doc(instrument: dict, outfile: Path) -> dict:
     return {
@@ -237,89 +470,274 @@ def ensure_tf(doc: dict, unit: str, interval: str) -> dict:
             "max_seen_date": None,
             "next_backfill_to_date": None,
             "done_backfill": False,
-            "candles": []
+            "candles": [],
+            "_ts_index": set(),
         }
         doc["timeframes"][key] = tf
+    elif "_ts_index" not in tf:
+        # Loaded from disk: index the timestamps once, then keep it current on merge
+        tf["_ts_index"] = {c[0] for c in tf["candles"]}
     return tf
 
-def dedup_and_merge(existing: list, new_list: list, mode: str) -> list:
+_candle_ts = itemgetter(0)
+
+def dedup_and_merge(existing: list, new_list: list, mode: str, ts_index: typing.Optional[set] = None) -> list:
     """
     Merge candles arrays with dedup by timestamp.
     - existing/new_list items are arrays [ts, o, h, l, c, v, oi]
     - mode: "forward" (append at end) or "backward" (prepend at start)
     Result must be sorted by timestamp ascending.
+
+    Both inputs are sorted (ISO8601 timestamps sort lexicographically), so the
+    chunk's span is located in existing by binary search and only that window is
+    two-pointer merged; on a timestamp clash the existing candle wins.
+    ts_index (the timeframe's set of known timestamps) lets already-seen rows be
+    dropped without touching existing; it is updated with the rows kept.
     """
-    if not existing:
-        # Ensure new_list sorted by ts
-        new_sorted = sorted(new_list, key=lambda x: x[0])
-        return new_sorted
-
-    existing_ts = set(c[0] for c in existing)
-    filtered = [c for c in new_list if c[0] not in existing_ts]
-    if not filtered:
+    if ts_index is not None:
+        fresh = []
+        for c in new_list:
+            if c[0] not in ts_index:
+                ts_index.add(c[0])
+                fresh.append(c)
+        new_list = fresh
+    if not new_list:
         return existing
-
-    if mode == "forward":
-        # Assume filtered are >= existing last; still sort to be safe
-        filtered.sort(key=lambda x: x[0])
-        return existing + filtered
-    else:
-        # backward: filtered should be <= existing first; sort and prepend
-        filtered.sort(key=lambda x: x[0])
-        return filtered + existing
+    new_list.sort(key=_candle_ts)
+
+    # Common case: the chunk lies entirely past the end we're growing.
+    # Grow existing in place rather than copying the whole history per chunk.
+    if existing:
+        if mode == "forward" and new_list[0][0] > existing[-1][0]:
+            existing.extend(_dedup_sorted(new_list))
+            return existing
+        if mode != "forward" and new_list[-1][0] < existing[0][0]:
+            existing[:0] = _dedup_sorted(new_list)
+            return existing
+
+    # Overlap: everything outside [lo, hi) is untouched, so merge just that window
+    lo = bisect.bisect_left(existing, new_list[0][0], key=_candle_ts)
+    hi = bisect.bisect_right(existing, new_list[-1][0], lo=lo, key=_candle_ts)
+    existing[lo:hi] = _merge_sorted(existing[lo:hi], new_list)
+    return existing
+
+def _merge_sorted(existing: list, new_list: list) -> list:
+    merged = []
+    i, j = 0, 0
+    n, m = len(existing), len(new_list)
+    while i < n and j < m:
+        a = existing[i][0]
+        b = new_list[j][0]
+        if a < b:
+            merged.append(existing[i])
+            i += 1
+        elif a == b:
+            merged.append(existing[i])
+            i += 1
+            j += 1
+        else:
+            if not merged or merged[-1][0] != b:
+                merged.append(new_list[j])
+            j += 1
+    if i < n:
+        merged.extend(existing[i:])
+    while j < m:
+        if not merged or merged[-1][0] != new_list[j][0]:
+            merged.append(new_list[j])
+        j += 1
+    return merged
+
+def _dedup_sorted(candles: list) -> list:
+    # Drop repeated timestamps from an already sorted chunk
+    out = candles[:1]
+    for c in candles[1:]:
+        if c[0] != out[-1][0]:
+            out.append(c)
+    return out
 
 def update_tf_bounds(tf: dict):
     if not tf["candles"]:
         tf["min_seen_date"] = None
         tf["max_seen_date"] = None
         return
-    first_d = parse_date_from_timestamp(tf["candles"][0][0])
-    last_d = parse_date_from_timestamp(tf["candles"][-1][0])
-    tf["min_seen_date"] = first_d.isoformat()
-    tf["max_seen_date"] = last_d.isoformat()
+    # "YYYY-MM-DD..." -> first 10 chars; candles are sorted so only the ends matter
+    tf["min_seen_date"] = tf["candles"][0][0][:10]
+    tf["max_seen_date"] = tf["candles"][-1][0][:10]
 
 # ----------------------------
 # Networking
 # ----------------------------
 
+class AsyncRateLimiter:
+    """
+    Token bucket shared by every task: at most `rate` requests per `period`
+    seconds across the whole process, with bursts of up to `rate`.
+    """
+
+    def __init__(self, rate: float, period: float = 1.0):
+        self.rate = max(float(rate), 1.0)
+        self.period = period
+        self._tokens = self.rate
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        # Waiters queue on the lock, so tokens are handed out in FIFO order
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.rate, self._tokens + (now - self._updated) * self.rate / self.period)
+                self._updated = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                await asyncio.sleep((1.0 - self._tokens) * self.period / self.rate)
+
+rate_limiter = AsyncRateLimiter(REQUESTS_PER_SECOND)
+
+def parse_retry_after(value: typing.Optional[str]) -> typing.Optional[float]:
+    """
+    Retry-After is either delta-seconds or an HTTP-date; None if absent/unparseable.
+    The server's value is honored up to RETRY_AFTER_MAX_SECONDS, since it pauses
+    every task via the breaker: "inf", "nan" or a far-future date must not stall the run.
+    """
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            when = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if when.tzinfo is None:
+            when = when.replace(tzinfo=timezone.utc)
+        seconds = (when - datetime.now(timezone.utc)).total_seconds()
+    if not math.isfinite(seconds):
+        return None
+    if seconds > RETRY_AFTER_MAX_SECONDS:
+        logging.warning("Retry-After %r exceeds %.0fs; capping", value, RETRY_AFTER_MAX_SECONDS)
+        return RETRY_AFTER_MAX_SECONDS
+    return max(seconds, 0.0)
+
+def next_retry_delay(prev_delay: float) -> float:
+    # "Decorrelated jitter": spreads retries from many tasks instead of syncing them up
+    return min(RETRY_MAX_DELAY, random.uniform(RETRY_BASE_DELAY, prev_delay * 3))
+
+# Circuit breaker for the API host: after BREAKER_FAILURE_THRESHOLD consecutive
+# server/network failures (or a 429 with Retry-After) every task pauses until
+# _breaker_open_until instead of each one hammering a struggling server.
+_breaker_open_until = 0.0
+_consecutive_failures = 0
+
+def open_breaker(seconds: float) -> None:
+    global _breaker_open_until
+    _breaker_open_until = max(_breaker_open_until, time.monotonic() + seconds)
+
+def record_request_outcome(ok: bool) -> None:
+    global _consecutive_failures
+    if ok:
+        _consecutive_failures = 0
+        return
+    _consecutive_failures += 1
+    if _consecutive_failures >= BREAKER_FAILURE_THRESHOLD:
+        logging.warning("%d consecutive API failures; pausing all requests for %.0fs",
+                        _consecutive_failures, BREAKER_COOLDOWN_SECONDS)
+        open_breaker(BREAKER_COOLDOWN_SECONDS)
+        _consecutive_failures = 0
+
+async def wait_for_breaker() -> None:
+    while True:
+        remaining = _breaker_open_until - time.monotonic()
+        if remaining <= 0:
+            return
+        await asyncio.sleep(remaining)
+
+class GzipStreamReader:
+    """
+    Async file-like view of a gzip-compressed response body: read() returns
+    decompressed bytes as chunks arrive, which is what ijson's async parser expects.
+    """
+
+    def __init__(self, content: aiohttp.StreamReader, chunk_size: int = 65536):
+        self._chunks = content.iter_chunked(chunk_size)
+        self._inflater = zlib.decompressobj(32 + zlib.MAX_WBITS)  # gzip header
+        self._eof = False
+
+    async def read(self, size: int = -1) -> bytes:
+        if size == 0:
+            # ijson probes with read(0) to detect bytes vs str; don't consume input
+            return b""
+        while not self._eof:
+            try:
+                chunk = await self._chunks.__anext__()
+            except StopAsyncIteration:
+                self._eof = True
+                return self._inflater.flush()
+            out = self._inflater.decompress(chunk)
+            if out:
+                return out
+        return b""
+
 async def download_instruments(session: aiohttp.ClientSession) -> list:
     logging.info("Downloading instruments list from %s", INSTRUMENTS_URL)
+    # Stream-decompress and parse one instrument at a time instead of holding the
+    # compressed blob, the inflated JSON and the full parsed list all at once.
+    total = 0
+    eqs = []
     async with session.get(INSTRUMENTS_URL, headers={"User-Agent": USER_AGENT}) as resp:
         resp.raise_for_status()
-        content = await resp.read()
-    buf = gzip.decompress(content)
-    instruments = json.loads(buf.decode("utf-8"))
-    eqs = [ins for ins in instruments if ins.get("instrument_type") == "EQ"]
-    logging.info("Parsed %d instruments, EQ only: %d", len(instruments), len(eqs))
+        async for ins in ijson.items(GzipStreamReader(resp.content), "item", use_float=True):
+            total += 1
+            if ins.get("instrument_type") == "EQ":
+                eqs.append(ins)
+    logging.info("Parsed %d instruments, EQ only: %d", total, len(eqs))
     return eqs
 
+@functools.lru_cache(maxsize=8192)
+def quote_url_segment(s: str) -> str:
+    return quote(s, safe='')
+
 async def fetch_candles_chunk(session: aiohttp.ClientSession, instrument_key: str, unit: str, interval: str, to_date_d: date, from_date_d: date) -> typing.Optional[list]:
-    instrument_key_enc = quote(instrument_key, safe='')
-    unit_enc = quote(unit, safe='')
-    interval_enc = quote(interval, safe='')
-    to_enc = quote(fmt_date(to_date_d), safe='')
-    from_enc = quote(fmt_date(from_date_d), safe='')
-    url = f"{API_BASE}/{instrument_key_enc}/{unit_enc}/{interval_enc}/{to_enc}/{from_enc}"
+    # ISO dates are already URL-safe; the other segments repeat across every chunk
+    url = (f"{API_BASE}/{quote_url_segment(instrument_key)}/{quote_url_segment(unit)}/"
+           f"{quote_url_segment(interval)}/{fmt_date(to_date_d)}/{fmt_date(from_date_d)}")
 
+    delay = RETRY_BASE_DELAY
     for attempt in range(1, RETRY_COUNT + 1):
+        delay = next_retry_delay(delay)
         try:
+            await wait_for_breaker()
+            await rate_limiter.acquire()
             async with session.get(url, headers=HEADERS) as resp:
-                text = await resp.text()
+                raw = await resp.read()
                 if resp.status == 200:
+                    record_request_outcome(True)
                     try:
-                        payload = json.loads(text)
+                        payload = orjson.loads(raw)
                     except Exception as e:
                         logging.warning("JSON parse error for %s: %s", url, e)
                         return None
                     return payload.get("data", {}).get("candles", [])
+                elif resp.status == 429:
+                    retry_after = parse_retry_after(resp.headers.get("Retry-After"))
+                    if retry_after is not None:
+                        # The server told everyone to back off, not just this task
+                        open_breaker(retry_after)
+                        delay = max(delay, retry_after)
+                    logging.warning("Rate limited on %s (attempt %d); retrying in %.1fs", url, attempt, delay)
                 elif 400 <= resp.status < 500:
-                    logging.warning("Client %s for %s: %s", resp.status, url, text[:200])
+                    record_request_outcome(True)
+                    logging.warning("Client %s for %s: %s", resp.status, url, raw[:200].decode("utf-8", "replace"))
                     return []
                 else:
-                    logging.warning("Server %s for %s (attempt %d): %s", resp.status, url, attempt, text[:200])
+                    record_request_outcome(False)
+                    logging.warning("Server %s for %s (attempt %d): %s", resp.status, url, attempt, raw[:200].decode("utf-8", "replace"))
         except Exception as e:
+            record_request_outcome(False)
             logging.warning("Network error on %s (attempt %d): %s", url, attempt, e)
-        await asyncio.sleep(RETRY_BACKOFF ** (attempt - 1))
+        if attempt < RETRY_COUNT:
+            await asyncio.sleep(delay)
     logging.error("Exceeded retries for %s", url)
     return None
 
@@ -335,38 +753,36 @@ async def backfill_timeframe(session: aiohttp.ClientSession, instrument: dict, d
     unit_start = UNIT_AVAILABILITY.get(unit, date(2000, 1, 1))
     to_date_d = min(today_date(), date.fromisoformat(tf["next_backfill_to_date"])) if tf.get("next_backfill_to_date") else today_date()
     chunk_delta = get_chunk_delta(unit, interval)
+    key = tf_key(unit, interval)
 
     while True:
         tentative_from = to_date_d - chunk_delta + timedelta(days=1)
         from_date_d = max(tentative_from, unit_start)
         if from_date_d > to_date_d:
-            tf["done_backfill"] = True
-            doc["last_updated_utc"] = iso_utc_now()
-            atomic_write_json(outfile, doc)
+            async with doc_lock(doc):
+                tf["done_backfill"] = True
+                await record_chunk(outfile, doc, key, "backward", [])
             break
 
         candles = await fetch_candles_chunk(session, instrument["instrument_key"], unit, interval, to_date_d, from_date_d)
         if candles is None:
             break
-        if not candles:
-            tf["done_backfill"] = True
-            doc["last_updated_utc"] = iso_utc_now()
-            atomic_write_json(outfile, doc)
-            break
-
-        # Merge (prepend because we're going backwards)
-        tf["candles"] = dedup_and_merge(tf["candles"], candles, mode="backward")
-        update_tf_bounds(tf)
+        async with doc_lock(doc):
+            if not candles:
+                tf["done_backfill"] = True
+                await record_chunk(outfile, doc, key, "backward", [])
+                break
 
-        # Move pointer back one day before this chunk
-        to_date_d = from_date_d - timedelta(days=1)
-        tf["next_backfill_to_date"] = to_date_d.isoformat()
+            # Merge (prepend because we're going backwards)
+            tf["candles"] = dedup_and_merge(tf["candles"], candles, mode="backward", ts_index=tf["_ts_index"])
+            update_tf_bounds(tf)
 
-        # Persist after each chunk (resumable)
-        doc["last_updated_utc"] = iso_utc_now()
-        atomic_write_json(outfile, doc)
+            # Move pointer back one day before this chunk
+            to_date_d = from_date_d - timedelta(days=1)
+            tf["next_backfill_to_date"] = to_date_d.isoformat()
 
-        await asyncio.sleep(1.0 / max(REQUESTS_PER_SECOND, 1))
+            # Journal after each chunk (resumable); the JSON is rewritten in batches
+            await record_chunk(outfile, doc, key, "backward", candles)
 
     logging.info("Backfill %s %s for %s -> min=%s max=%s done=%s",
                  unit, interval, instrument.get("trading_symbol") or instrument["instrument_key"],
@@ -383,6 +799,7 @@ async def forward_fill_to_today(session: aiohttp.ClientSession, instrument: dict
         return
 
     chunk_delta = get_chunk_delta(unit, interval)
+    key = tf_key(unit, interval)
     while cur_from <= end_target:
         cur_to = min(end_target, (cur_from + (chunk_delta - timedelta(days=1))))
         candles = await fetch_candles_chunk(session, instrument["instrument_key"], unit, interval, cur_to, cur_from)
@@ -392,19 +809,37 @@ async def forward_fill_to_today(session: aiohttp.ClientSession, instrument: dict
             break
 
         # Merge at the end (forward)
-        tf["candles"] = dedup_and_merge(tf["candles"], candles, mode="forward")
-        update_tf_bounds(tf)
-
-        doc["last_updated_utc"] = iso_utc_now()
-        atomic_write_json(outfile, doc)
+        async with doc_lock(doc):
+            tf["candles"] = dedup_and_merge(tf["candles"], candles, mode="forward", ts_index=tf["_ts_index"])
+            update_tf_bounds(tf)
+            await record_chunk(outfile, doc, key, "forward", candles)
 
         cur_from = cur_to + timedelta(days=1)
-        await asyncio.sleep(1.0 / max(REQUESTS_PER_SECOND, 1))
 
     logging.info("Forward top-up %s %s for %s -> now max=%s",
                  unit, interval, instrument.get("trading_symbol") or instrument["instrument_key"],
                  tf.get("max_seen_date"))
 
+async def run_all(coros: typing.Iterable[typing.Awaitable]) -> None:
+    """
+    Run coroutines concurrently. If one fails (or we are cancelled), cancel the
+    rest and wait for them before re-raising, so no task outlives the caller and
+    keeps writing into a doc that has already been flushed.
+    """
+    tasks = [asyncio.ensure_future(c) for c in coros]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+async def fill_timeframe(session: aiohttp.ClientSession, instrument: dict, doc: dict, outfile: Path, unit: str, interval: str):
+    # Backfill historically (resumable), then ensure up to today
+    await backfill_timeframe(session, instrument, doc, outfile, unit, interval)
+    await forward_fill_to_today(session, instrument, doc, outfile, unit, interval)
+
 async def fetch_for_instrument(session: aiohttp.ClientSession, sem: asyncio.Semaphore, instrument: dict):
     async with sem:
         instrument_key = instrument.get("instrument_key")
@@ -413,26 +848,34 @@ async def fetch_for_instrument(session: aiohttp.ClientSession, sem: asyncio.Sema
             return
 
         outfile = instrument_outfile(instrument.get("segment"), instrument.get("trading_symbol"), instrument_key)
-        doc = load_doc(outfile)
+        doc = await asyncio.to_thread(load_doc, outfile)
         if not doc:
             doc = init_doc(instrument, outfile)
-            atomic_write_json(outfile, doc)
+            # Salvage any journal left next to a missing/unreadable JSON
+            replay_journal(outfile, doc)
+            await asyncio.to_thread(save_doc, outfile, doc)
 
-        # Backfill historically (resumable)
+        # Create every timeframe up front so a save running on a worker thread never
+        # sees doc["timeframes"] change size mid-iteration.
         for unit, interval in TIMEFRAMES:
-            await backfill_timeframe(session, instrument, doc, outfile, unit, interval)
+            ensure_tf(doc, unit, interval)
 
-        # Then ensure up to today
-        for unit, interval in TIMEFRAMES:
-            await forward_fill_to_today(session, instrument, doc, outfile, unit, interval)
+        # Timeframes hit different URLs and only share `doc`, so run them concurrently;
+        # the global rate limiter still bounds the request rate.
+        try:
+            await run_all(fill_timeframe(session, instrument, doc, outfile, unit, interval)
+                          for unit, interval in TIMEFRAMES)
+        finally:
+            await flush_doc(outfile, doc)
 
         logging.info("Finished %s (%s) -> %s", instrument.get("trading_symbol") or instrument_key, instrument_key, outfile)
 
-async def topup_existing_files_to_today(session: aiohttp.ClientSession, sem: asyncio.Semaphore):
-    for jf in OUTPUT_DIR.rglob("*.json"):
-        doc = load_doc(jf)
+async def topup_existing_file(session: aiohttp.ClientSession, sem: asyncio.Semaphore, jf: Path):
+    async with sem:
+        # Large documents: keep the parse off the event loop
+        doc = await asyncio.to_thread(load_doc, jf)
         if not doc:
-            continue
+            return
         inst = doc.get("instrument") or {}
         instrument = {
             "instrument_key": inst.get("instrument_key"),
@@ -443,20 +886,41 @@ async def topup_existing_files_to_today(session: aiohttp.ClientSession, sem: asy
             "name": inst.get("name"),
         }
         if not instrument["instrument_key"]:
-            continue
+            return
+        fills = []
         for key in list((doc.get("timeframes") or {}).keys()):
             try:
                 unit, interval = key.split("|", 1)
             except Exception:
                 continue
-            await forward_fill_to_today(session, instrument, doc, jf, unit, interval)
+            fills.append(forward_fill_to_today(session, instrument, doc, jf, unit, interval))
+        try:
+            await run_all(fills)
+        finally:
+            await flush_doc(jf, doc)
+
+async def topup_existing_files_to_today(session: aiohttp.ClientSession, sem: asyncio.Semaphore):
+    files = list(OUTPUT_DIR.rglob("*.json"))
+    results = await asyncio.gather(*(topup_existing_file(session, sem, jf) for jf in files),
+                                   return_exceptions=True)
+    for jf, res in zip(files, results):
+        if isinstance(res, Exception):
+            logging.error("Top-up failed for %s: %s", jf, res)
 
 # ----------------------------
 # Main
 # ----------------------------
 
 async def main():
-    conn = aiohttp.TCPConnector(limit=MAX_CONCURRENCY * 2)
+    # Nearly all traffic goes to one API host: cap sockets per host, keep them
+    # alive between rate-limited requests and cache the DNS lookup.
+    conn = aiohttp.TCPConnector(
+        limit=64,
+        limit_per_host=MAX_CONCURRENCY * 2,
+        ttl_dns_cache=DNS_CACHE_TTL,
+        keepalive_timeout=KEEPALIVE_TIMEOUT,
+        force_close=False,
+    )
     timeout = aiohttp.ClientTimeout(total=600)
     sem = asyncio.Semaphore(MAX_CONCURRENCY)
     async with aiohttp.ClientSession(connector=conn, timeout=timeout) as session:
@@ -480,7 +944,12 @@ async def main():
 
         logging.info("All done.")
 
+def _exit_on_sigterm(signum, frame):
+    # Turn SIGTERM into a normal exit so pending journals are flushed (flush_doc in finally)
+    raise SystemExit(128 + signum)
+
 if __name__ == "__main__":
+    signal.signal(signal.SIGTERM, _exit_on_sigterm)
     try:
         asyncio.run(main())
     except KeyboardInterrupt: